@@ -16,6 +16,7 @@ setup(
     zip_safe=False,
     platforms="Linux",
     install_requires=[],
+    extras_require={"orjson": ["orjson"]},
     classifiers=[
         "Programming Language :: Python",
         "Environment :: Web Environment",
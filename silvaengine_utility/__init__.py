@@ -6,6 +6,16 @@ __all__ = ["utility", "http", "graphql", "authorizer", "common"]
 
 from .authorizer import Authorizer
 from .common import Common
-from .graphql import JSON, Graphql
+from .graphql import Graphql
 from .http import HttpResponse
 from .utility import Struct, Utility
+
+
+def __getattr__(name):
+    # Importing the JSON scalar loads graphene, so defer it until it is used.
+    if name == "JSON":
+        from .scalars import JSON
+
+        return JSON
+
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
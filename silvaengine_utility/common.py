@@ -3,10 +3,36 @@
 from __future__ import print_function
 from collections import defaultdict
 from silvaengine_utility.utility import Utility
-import boto3, json
+import boto3, json, threading
 
 __author__ = "bl"
 
+# boto3 clients are thread-safe and costly to build (credential chain,
+# endpoint resolution), so one Lambda client is kept per region/credentials.
+_lambda_clients = {}
+_lambda_clients_lock = threading.Lock()
+
+
+def _get_lambda_client(
+    region_name, aws_access_key_id=None, aws_secret_access_key=None
+):
+    key = (region_name, aws_access_key_id, aws_secret_access_key)
+    client = _lambda_clients.get(key)
+
+    if client is None:
+        with _lambda_clients_lock:
+            client = _lambda_clients.get(key)
+
+            if client is None:
+                client = _lambda_clients[key] = boto3.client(
+                    "lambda",
+                    aws_access_key_id=aws_access_key_id,
+                    aws_secret_access_key=aws_secret_access_key,
+                    region_name=region_name,
+                )
+
+    return client
+
 
 class Common(object):
     @staticmethod
@@ -46,8 +72,6 @@ class Common(object):
                 }
 
                 for seller_role in role_sellers:
-                    # print("*************************************************************")
-                    # print(seller_role)
                     if (
                         seller_role
                         and seller_role.get("type")
@@ -70,16 +94,14 @@ class Common(object):
     def invoke_data_process(settings, data_payload, channel, invocation_type="Event"):
         try:
             if "app_env" not in settings or (settings["app_env"] != "local"):
-                lambda_client = boto3.client(
-                    "lambda",
-                    region_name=settings.get("aws_region_name", "us-east-1"),
+                lambda_client = _get_lambda_client(
+                    settings.get("aws_region_name", "us-east-1"),
                 )
             else:
-                lambda_client = boto3.client(
-                    "lambda",
+                lambda_client = _get_lambda_client(
+                    settings.get("aws_region_name", "us-east-1"),
                     aws_access_key_id=settings.get("aws_access_key_id"),
                     aws_secret_access_key=settings.get("aws_secret_access_key"),
-                    region_name=settings.get("aws_region_name", "us-east-1"),
                 )
 
             if invocation_type not in ["RequestResponse", "Event"]:
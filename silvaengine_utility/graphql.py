@@ -4,79 +4,93 @@ from __future__ import print_function
 
 __author__ = "bl"
 
-import graphene
+import sys
+from functools import lru_cache
+
 from graphql import parse
-from graphql.language.ast import (
-    SelectionSet,
-    BooleanValue,
-    StringValue,
-    IntValue,
-    ListValue,
-    ObjectValue,
-    FloatValue,
-)
+from graphql.language.ast import Document
+
+# Clients resend the same documents, and the extractors below only read the
+# AST, so a parsed document can be shared by every request with that source.
+_parse_cached = lru_cache(maxsize=512)(parse)
+
+
+def _parse_document(source):
+    # Callers that already hold a parsed document skip parsing altogether.
+    if isinstance(source, Document):
+        return source
+
+    return _parse_cached(source) if isinstance(source, str) else parse(source)
 
 
 class Graphql(object):
     # Parse the graphql request's body to AST and extract fields from the AST
     @staticmethod
     def extract_fields_from_ast(source, **kwargs):
-        def extract_by_recursion(selections, **kwargs):
-            fs = []
-            dpt = kwargs.get("deepth")
-
-            if type(dpt) is not int or dpt < 1:
+        # Fields are accumulated as keys of a single dict shared by every level:
+        # O(1) dedup that keeps first-seen order, with no per-level merge.
+        # The walk is an explicit pre-order stack; each entry carries the depth
+        # budget left for its children (None means unlimited).
+        def extract_by_walk(selections, fs, deepth):
+            if not isinstance(deepth, int) or deepth < 1:
                 dpt = None
             else:
-                dpt -= 1
+                dpt = deepth - 1
 
-            for s in selections:
-                if not (s.name.value in fs):
-                    fs.append(s.name.value.lower())
+            stack = [(s, dpt) for s in reversed(selections)]
 
-                if (
-                    (dpt is None or dpt > 0)
-                    and hasattr(s, "selection_set")
-                    and type(s.selection_set) is SelectionSet
-                    and type(s.selection_set.selections) is list
-                    and len(s.selection_set.selections) > 0
-                ):
-                    fs += extract_by_recursion(s.selection_set.selections, deepth=dpt)
+            while stack:
+                s, dpt = stack.pop()
+                fs[s.name.value.lower()] = None
 
-            return fs
+                if dpt is not None and dpt < 1:
+                    continue
+
+                selection_set = getattr(s, "selection_set", None)
+                subs = selection_set.selections if selection_set else None
+
+                if subs:
+                    dpt = None if dpt is None else dpt - 1
+                    stack.extend((c, dpt) for c in reversed(subs))
 
         result = dict()
         operation = kwargs.get("operation")
+        operation = operation.lower() if operation else None
         deepth = kwargs.get("deepth")
-        ast = parse(source)
+        ast = _parse_document(source)
 
         for od in ast.definitions:
-            on = od.operation.lower()
+            # The parser stores the operation keyword as written, which GraphQL
+            # only accepts in lowercase ("query", "mutation", "subscription").
+            on = od.operation
 
-            if operation and on != operation.lower():
+            if operation and on != operation:
                 continue
 
-            result[on] = [od.name.value]
+            fields = result[on] = {od.name.value: None}
+            extract_by_walk(od.selection_set.selections, fields, deepth)
 
-            if on in result:
-                result[on] += extract_by_recursion(
-                    od.selection_set.selections, deepth=deepth
-                )
-            else:
-                result[on] = extract_by_recursion(
-                    od.selection_set.selections, deepth=deepth
-                )
-
-        for operation in result:
-            result[operation] = list({}.fromkeys(result[operation]).keys())
-
-        return result
+        return {on: list(fields) for on, fields in result.items()}
 
     @staticmethod
     def extract_flatten_ast(source):
-        def extract_by_recursion(selections, path=""):
-            fields = []
+        # Repeated field names (e.g. in lists of items) are normalized once per
+        # call and interned, so equal names share one string object.
+        normalized = {}
+
+        def normalize(name):
+            value = normalized.get(name)
 
+            if value is None:
+                value = normalized[name] = sys.intern(name.strip().lower())
+
+            return value
+
+        # Fields are bucketed by path straight into the output dict while walking,
+        # instead of building one {"field", "path"} dict per node and regrouping.
+        def extract_by_recursion(selections, output, path=""):
+            # The path is only ever built from "/" and normalized names, so it
+            # is already a valid bucket key and needs no further copies.
             if not path or path[-1] != "/":
                 path += "/"
 
@@ -89,105 +103,52 @@ class Graphql(object):
                 ):
                     continue
 
-                value = field.name.value.strip().lower()
+                value = normalize(field.name.value)
+                bucket = output.setdefault(path, [])
 
-                fields.append({"field": value, "path": path.strip().lower()})
+                if value:
+                    bucket.append(value)
 
-                if (
-                    hasattr(field, "selection_set")
-                    and type(field.selection_set) is SelectionSet
-                    and type(field.selection_set.selections) is list
-                    and len(field.selection_set.selections) > 0
-                ):
-                    fields += extract_by_recursion(
-                        field.selection_set.selections, path + value
-                    )
+                selection_set = getattr(field, "selection_set", None)
+                subs = selection_set.selections if selection_set else None
 
-            return fields
+                if subs:
+                    extract_by_recursion(subs, output, path + value)
 
-        def flatten(selections):
-            output = {}
+        results = []
+        ast = _parse_document(source)
 
-            for item in extract_by_recursion(selections):
-                if output.get(item.get("path")) is None:
-                    output[item.get("path")] = []
+        # parse() always returns a Document whose definitions is a list.
+        for operation_definition in ast.definitions:
+            result = {}
 
-                if item.get("field") is not None and item.get("field") != "":
-                    output[item.get("path")].append(item.get("field"))
+            if hasattr(operation_definition, "operation"):
+                result["operation"] = operation_definition.operation.strip().lower()
 
-            return output
+            if hasattr(operation_definition, "name") and hasattr(
+                operation_definition.name, "value"
+            ):
+                result[
+                    "operation_name"
+                ] = operation_definition.name.value.strip().lower()
 
-        results = []
-        ast = parse(source)
-
-        if (
-            ast
-            and hasattr(ast, "definitions")
-            and type(ast.definitions) is list
-            and len(ast.definitions)
-        ):
-            for operation_definition in ast.definitions:
-                result = {}
-
-                if hasattr(operation_definition, "operation"):
-                    result["operation"] = operation_definition.operation.strip().lower()
-
-                if hasattr(operation_definition, "name") and hasattr(
-                    operation_definition.name, "value"
-                ):
-                    result[
-                        "operation_name"
-                    ] = operation_definition.name.value.strip().lower()
+            selection_set = getattr(operation_definition, "selection_set", None)
+            subs = getattr(selection_set, "selections", None)
 
-                if (
-                    hasattr(operation_definition, "selection_set")
-                    and type(operation_definition.selection_set) is SelectionSet
-                    and hasattr(operation_definition.selection_set, "selections")
-                    and type(operation_definition.selection_set.selections) is list
-                    and len(operation_definition.selection_set.selections) > 0
-                ):
-                    result["fields"] = flatten(
-                        operation_definition.selection_set.selections
-                    )
+            if subs:
+                result["fields"] = {}
+                extract_by_recursion(subs, result["fields"])
 
-                results.append(result)
+            results.append(result)
 
         return results
 
 
-class JSON(graphene.Scalar):
-    """
-    The `JSON` scalar type represents JSON values as specified by
-    [ECMA-404](http://www.ecma-international.org/
-    publications/files/ECMA-ST/ECMA-404.pdf).
-    """
+def __getattr__(name):
+    # JSON lives in .scalars so importing Graphql does not load graphene.
+    if name == "JSON":
+        from .scalars import JSON
 
-    @staticmethod
-    def identity(value):
-        if isinstance(value, (str, bool, int, float)):
-            return value.__class__(value)
-        elif isinstance(value, (list, dict)):
-            return value
-        else:
-            return None
-
-    serialize = identity
-    parse_value = identity
+        return JSON
 
-    @staticmethod
-    def parse_literal(ast):
-        if isinstance(ast, (StringValue, BooleanValue)):
-            return ast.value
-        elif isinstance(ast, IntValue):
-            return int(ast.value)
-        elif isinstance(ast, FloatValue):
-            return float(ast.value)
-        elif isinstance(ast, ListValue):
-            return [JSON.parse_literal(value) for value in ast.values]
-        elif isinstance(ast, ObjectValue):
-            return {
-                field.name.value: JSON.parse_literal(field.value)
-                for field in ast.fields
-            }
-        else:
-            return None
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -7,6 +7,13 @@ __author__ = "bl"
 from graphql.error import GraphQLError, format_error as format_graphql_error
 from .utility import Utility
 
+# Template for the response headers; each response gets its own copy, so
+# handlers can add headers without affecting later responses.
+_RESPONSE_HEADERS = {
+    "Access-Control-Allow-Headers": "Access-Control-Allow-Origin",
+    "Access-Control-Allow-Origin": "*",
+}
+
 
 class HttpResponse(object):
     @staticmethod
@@ -26,9 +33,6 @@ class HttpResponse(object):
 
         return {
             "statusCode": int(status_code),
-            "headers": {
-                "Access-Control-Allow-Headers": "Access-Control-Allow-Origin",
-                "Access-Control-Allow-Origin": "*",
-            },
+            "headers": dict(_RESPONSE_HEADERS),
             "body": (Utility.json_dumps(body)),
         }
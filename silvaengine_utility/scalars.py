@@ -0,0 +1,94 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+from __future__ import print_function
+
+__author__ = "bl"
+
+import graphene
+from graphql.language.ast import (
+    BooleanValue,
+    StringValue,
+    IntValue,
+    ListValue,
+    ObjectValue,
+    FloatValue,
+)
+
+
+class JSON(graphene.Scalar):
+    """
+    The `JSON` scalar type represents JSON values as specified by
+    [ECMA-404](http://www.ecma-international.org/
+    publications/files/ECMA-ST/ECMA-404.pdf).
+    """
+
+    @staticmethod
+    def identity(value):
+        # Scalars are immutable, so they are returned as-is rather than rebuilt.
+        if isinstance(value, (str, bool, int, float, list, dict)):
+            return value
+
+        return None
+
+    serialize = identity
+    parse_value = identity
+
+    @staticmethod
+    def parse_literal(ast):
+        parser = _JSON_SCALAR_PARSERS.get(type(ast))
+
+        if parser:
+            return parser(ast)
+
+        # Walk nested lists and objects with an explicit stack of
+        # (container, key, node), filling each container slot in place.
+        root = [None]
+        stack = [(root, 0, ast)]
+
+        while stack:
+            container, key, node = stack.pop()
+            node_type = type(node)
+
+            if node_type is ListValue:
+                values = node.values
+                item_type = type(values[0]) if values else None
+                parser = _JSON_SCALAR_LIST_PARSERS.get(item_type)
+
+                # Lists holding a single scalar type are converted in one pass.
+                if parser and all(type(item) is item_type for item in values):
+                    value = parser(values)
+                else:
+                    value = [None] * len(values)
+                    stack.extend(
+                        (value, index, child) for index, child in enumerate(values)
+                    )
+            elif node_type is ObjectValue:
+                # Keys are placed up front to keep field order; fields are pushed
+                # reversed so a repeated name keeps its last value.
+                value = dict.fromkeys(field.name.value for field in node.fields)
+                stack.extend(
+                    (value, field.name.value, field.value)
+                    for field in reversed(node.fields)
+                )
+            else:
+                parser = _JSON_SCALAR_PARSERS.get(node_type)
+                value = parser(node) if parser else None
+
+            container[key] = value
+
+        return root[0]
+
+
+_JSON_SCALAR_PARSERS = {
+    StringValue: lambda ast: ast.value,
+    BooleanValue: lambda ast: ast.value,
+    IntValue: lambda ast: int(ast.value),
+    FloatValue: lambda ast: float(ast.value),
+}
+
+_JSON_SCALAR_LIST_PARSERS = {
+    StringValue: lambda values: [item.value for item in values],
+    BooleanValue: lambda values: [item.value for item in values],
+    IntValue: lambda values: [int(item.value) for item in values],
+    FloatValue: lambda values: [float(item.value) for item in values],
+}
@@ -4,15 +4,22 @@ from __future__ import print_function
 
 import asyncio
 import json
+import os
 import re
 import socket
 import struct
+import threading
+import time
 import traceback
+from collections import OrderedDict
 from datetime import date, datetime
 from decimal import Decimal
+from enum import Enum
 from importlib import import_module
 from importlib.util import find_spec
+from operator import attrgetter
 from types import FunctionType
+from uuid import UUID
 
 import dateutil
 from graphql.error import GraphQLError
@@ -20,8 +27,10 @@ from graphql.error import format_error as format_graphql_error
 from sqlalchemy import create_engine, orm
 from sqlalchemy.ext.declarative import DeclarativeMeta
 
-# import jsonpickle
-# from sqlalchemy.ext.declarative import DeclarativeMeta
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 __author__ = "bibow"
 
@@ -32,7 +41,20 @@ datetime_format_regex_patterns = [
     r"^\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}[+|-]\d{4}$",
     r"^\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}[+|-]\d{2}:\d{2}$",
 ]
-
+# Compiled once: JSONDecoder.object_hook tests every string value against it.
+datetime_format_regex = re.compile(
+    "|".join(f"(?:{pattern})" for pattern in datetime_format_regex_patterns)
+)
+
+# Fields requested and their readers in this module (the root type names are
+# for callers of fetch_graphql_schema):
+# - types.kind/name/fields, fields.name: the schema index,
+#   extract_available_fields, generate_graphql_operation's operation lookup
+# - fields.type.name/kind/ofType.name: extract_available_fields
+# - fields.type.ofType.kind, fields.type.kind/name: generate_graphql_operation
+#   (return type after NON_NULL unwrap)
+# - fields.args.name/type (two levels): generate_graphql_operation's
+#   format_type; list items wrapped any deeper are rendered as String.
 INTROSPECTION_QUERY = """
 query IntrospectionQuery {
     __schema {
@@ -67,6 +89,119 @@ query IntrospectionQuery {
         }
     }
 }"""
+# Whitespace-collapsed copy sent over the wire: a smaller payload for the
+# Lambda invocation and less for the remote parser to lex on every fetch.
+_INTROSPECTION_QUERY_COMPACT = " ".join(INTROSPECTION_QUERY.split())
+
+# Introspection schemas are large dicts that callers keep reusing, so lookups
+# derived from one are cached against its identity. Each entry holds the schema
+# itself, which keeps its id from being recycled while the entry is alive.
+_SCHEMA_INDEX_CACHE_SIZE = 16
+_schema_indexes = OrderedDict()
+_schema_indexes_lock = threading.Lock()
+
+
+def _get_schema_index(schema):
+    key = id(schema)
+
+    with _schema_indexes_lock:
+        entry = _schema_indexes.get(key)
+
+        if entry is not None and entry["schema"] is schema:
+            _schema_indexes.move_to_end(key)
+            return entry
+
+    entry = {
+        "schema": schema,
+        "types": {type_def["name"]: type_def for type_def in schema["types"]},
+        "fields": {},
+        "type_fields": {},
+        "subselections": {},
+        "operations": {},
+    }
+
+    with _schema_indexes_lock:
+        _schema_indexes[key] = entry
+
+        while len(_schema_indexes) > _SCHEMA_INDEX_CACHE_SIZE:
+            _schema_indexes.popitem(last=False)
+
+    return entry
+
+
+# Lookups derived from a schema index are cached in that same index.
+def _get_type_fields(schema_index, type_name):
+    type_fields = schema_index["type_fields"].get(type_name)
+
+    if type_fields is None:
+        type_def = schema_index["types"].get(type_name) or {}
+        type_fields = {field["name"]: field for field in type_def.get("fields") or []}
+        schema_index["type_fields"][type_name] = type_fields
+
+    return type_fields
+
+
+def _extract_available_fields(schema_index, type_name):
+    cache = schema_index["fields"]
+
+    if type_name in cache:
+        return cache[type_name]
+
+    type_def = schema_index["types"].get(type_name)
+    fields = None
+
+    if type_def is not None and type_def["kind"] == "OBJECT":
+        fields = [
+            {
+                "name": field["name"],
+                "type": field["type"]["name"]
+                or (field["type"].get("ofType") or {}).get("name"),
+                "kind": field["type"]["kind"],
+            }
+            for field in type_def.get("fields", [])
+        ]
+
+    cache[type_name] = fields
+    return fields
+
+
+# Leaf types that never take a subselection.
+_GRAPHQL_SCALAR_NAMES = frozenset(
+    ("String", "Int", "Float", "Boolean", "ID", "DateTime", "JSON")
+)
+
+# Levels of nested object types expanded by generate_field_subselection.
+_SUBSELECTION_MAX_DEPTH = int(os.getenv("GRAPHQL_SUBSELECTION_DEPTH", "6"))
+
+
+# Introspection results per (endpoint_id, funct, test_mode). The schema of a
+# deployed function rarely changes, so it is fetched at most once per TTL
+# window.
+_SCHEMA_CACHE_TTL = float(os.getenv("GRAPHQL_SCHEMA_CACHE_TTL", "3600"))
+_schema_cache = {}
+_schema_cache_lock = threading.Lock()
+
+
+# Column keys and a C-level attrgetter per mapped class, so each column is
+# read once per row instead of up to three times.
+_column_getters = {}
+
+
+def _get_column_getter(cls, mapper):
+    entry = _column_getters.get(cls)
+
+    if entry is None:
+        columns = tuple(column.key for column in mapper.columns)
+
+        if len(columns) == 1:
+            getter = attrgetter(columns[0])
+            entry = (columns, lambda obj: (getter(obj),))
+        else:
+            entry = (columns, attrgetter(*columns) if columns else lambda obj: ())
+
+        _column_getters[cls] = entry
+
+    return entry
 
 
 class JSONEncoder(json.JSONEncoder):
@@ -78,13 +213,11 @@ class JSONEncoder(json.JSONEncoder):
                     found = set()
 
                 mapper = orm.class_mapper(obj.__class__)
-                columns = [column.key for column in mapper.columns]
-                get_key_value = lambda c: (
-                    (c, getattr(obj, c).isoformat())
-                    if isinstance(getattr(obj, c), datetime)
-                    else (c, getattr(obj, c))
-                )
-                out = dict(map(get_key_value, columns))
+                columns, get_values = _get_column_getter(obj.__class__, mapper)
+                out = {
+                    column: value.isoformat() if isinstance(value, datetime) else value
+                    for column, value in zip(columns, get_values(obj))
+                }
 
                 for name, relation in mapper.relationships.items():
                     if relation not in found:
@@ -113,12 +246,33 @@ class JSONEncoder(json.JSONEncoder):
             return o.strftime(datetime_format)
         elif isinstance(o, (bytes, bytearray)):
             return str(o)
+        elif isinstance(o, Enum):
+            return o.value
+        elif isinstance(o, UUID):
+            return str(o)
         elif hasattr(o, "__dict__"):
             return o.__dict__
         else:
             return super(JSONEncoder, self).default(o)
 
 
+# With the optional orjson extra installed, json_dumps encodes through orjson
+# (2-space indent, sorted keys, UTF-8) several times faster than the stdlib.
+# Dates and dataclasses are passed through to JSONEncoder so they encode as
+# on the stdlib path, and JSONEncoder encodes Enum and UUID the way orjson
+# does natively. Two differences remain: NaN and Infinity become null
+# instead of NaN/Infinity, and float exponents are written in their shortest
+# form (1e16 and 1e-7 instead of 1e+16 and 1e-07).
+if orjson is not None:
+    _ORJSON_OPTIONS = (
+        orjson.OPT_INDENT_2
+        | orjson.OPT_SORT_KEYS
+        | orjson.OPT_PASSTHROUGH_DATETIME
+        | orjson.OPT_PASSTHROUGH_DATACLASS
+    )
+_json_encoder = JSONEncoder()
+
+
 class JSONDecoder(json.JSONDecoder):
     def __init__(self, *args, **kwargs):
         json.JSONDecoder.__init__(self, object_hook=self.object_hook, *args, **kwargs)
@@ -129,13 +283,8 @@ class JSONDecoder(json.JSONDecoder):
 
         for key, value in o.items():
             try:
-                if not isinstance(value, str):
-                    continue
-                for datetime_format_regex_pattern in datetime_format_regex_patterns:
-                    datetime_format_regex = re.compile(datetime_format_regex_pattern)
-                    if datetime_format_regex.match(value):
-                        o[key] = dateutil.parser.parse(value)
-                        break
+                if isinstance(value, str) and datetime_format_regex.match(value):
+                    o[key] = dateutil.parser.parse(value)
             except (ValueError, AttributeError):
                 pass
 
@@ -161,6 +310,16 @@ class Utility(object):
 
     @staticmethod
     def json_dumps(data):
+        if orjson is not None:
+            try:
+                return orjson.dumps(
+                    data, default=_json_encoder.default, option=_ORJSON_OPTIONS
+                ).decode("utf-8")
+            except TypeError:
+                # Non-string keys, integers beyond 64 bits and other values
+                # orjson rejects are left to the stdlib encoder below.
+                pass
+
         return json.dumps(
             data,
             indent=2,
@@ -169,7 +328,6 @@ class Utility(object):
             cls=JSONEncoder,
             ensure_ascii=False,
         )
-        # return jsonpickle.encode(data, unpicklable=False)
 
     @staticmethod
     def json_loads(data, parser_number=True):
@@ -178,7 +336,6 @@ class Utility(object):
                 data, cls=JSONDecoder, parse_float=Decimal, parse_int=Decimal
             )
         return json.loads(data, cls=JSONDecoder)
-        # return jsonpickle.decode(data)
 
     # Check the specified ip exists in the given ip segment
     @staticmethod
@@ -223,7 +380,6 @@ class Utility(object):
             return None
 
         agent = import_module(name=module_name, package=module_name)
-        # agent = __import__("{}.{}".format(module_name, module_name))
 
         if not agent:
             return None
@@ -231,7 +387,7 @@ class Utility(object):
         if class_name and hasattr(agent, str(class_name).strip()):
             class_name = str(class_name).strip()
 
-            if type(constructor_parameters) is dict and len(
+            if isinstance(constructor_parameters, dict) and len(
                 constructor_parameters.keys()
             ):
                 agent = getattr(agent, class_name)(**constructor_parameters)
@@ -273,7 +429,7 @@ class Utility(object):
     @staticmethod
     def create_database_session(settings):
         try:
-            assert type(settings) is dict and len(
+            assert isinstance(settings, dict) and len(
                 settings
             ), "Missing configuration items required to connect to mysql database."
 
@@ -333,10 +489,6 @@ class Utility(object):
 
     @staticmethod
     def convert_object_to_dict(instance):
-        # return {
-        #     c.key: getattr(instance, c.key)
-        #     for c in inspect(instance).mapper.column_attrs
-        # }
         attributes = {}
 
         for attribute in dir(instance):
@@ -533,106 +685,207 @@ class Utility(object):
         test_mode=None,
         aws_lambda=None,
     ):
+        """Fetch the introspected schema of a function, cached per TTL window.
+
+        The returned dict is shared by every caller and is what the schema
+        index (fields, subselections, operations) is built from, so it must
+        be treated as read-only; copy it before making changes.
+        """
+        # test_mode decides whether the call goes to the Lambda or to a local
+        # function, so the two routes are cached separately.
+        cache_key = (endpoint_id, funct, test_mode)
+
+        with _schema_cache_lock:
+            cached = _schema_cache.get(cache_key)
+
+        if cached is not None and time.monotonic() - cached[0] < _SCHEMA_CACHE_TTL:
+            return cached[1]
+
         schema = Utility.execute_graphql_query(
             logger,
             endpoint_id,
             funct,
-            query=INTROSPECTION_QUERY,
+            query=_INTROSPECTION_QUERY_COMPACT,
             setting=setting,
             test_mode=test_mode,
             aws_lambda=aws_lambda,
         )["__schema"]
+
+        # Index the schema while it is fresh so the first generated operation
+        # does not pay for it.
+        _get_schema_index(schema)
+
+        with _schema_cache_lock:
+            _schema_cache[cache_key] = (time.monotonic(), schema)
+
         return schema
 
     @staticmethod
     def extract_available_fields(schema, type_name):
-        for type_def in schema["types"]:
-            if type_def["name"] == type_name and type_def["kind"] == "OBJECT":
-                return [
-                    {
-                        "name": field["name"],
-                        "type": field["type"]["name"]
-                        or (field["type"].get("ofType") or {}).get("name"),
-                        "kind": field["type"]["kind"],
-                    }
-                    for field in type_def.get("fields", [])
-                ]
-        raise Exception(f"Type '{type_name}' not found in schema.")
+        fields = _extract_available_fields(_get_schema_index(schema), type_name)
+
+        if fields is None:
+            raise Exception(f"Type '{type_name}' not found in schema.")
+
+        # The cached summaries are shared by the subselection walk; hand out copies.
+        return [dict(field) for field in fields]
 
     @staticmethod
-    def generate_field_subselection(schema, type_name):
-        try:
-            fields = Utility.extract_available_fields(schema, type_name)
-            subselection = []
+    def generate_field_subselection(schema, type_name, max_depth=None):
+        return Utility._generate_field_subselection(
+            _get_schema_index(schema), type_name, max_depth=max_depth
+        )
+
+    @staticmethod
+    def _generate_field_subselection(schema_index, type_name, max_depth=None):
+        if max_depth is None:
+            max_depth = _SUBSELECTION_MAX_DEPTH
+
+        cache_key = (type_name, max_depth)
+        subselection = schema_index["subselections"].get(cache_key)
+
+        if subselection is not None:
+            return subselection
+
+        fields = _extract_available_fields(schema_index, type_name)
+
+        if fields is None:
+            return ""
+
+        # Walk nested types with an explicit stack of frames (type name,
+        # remaining fields, field name, tokens). Each frame collects its own
+        # tokens, and a nested field is written as "name { ... }" only once
+        # its frame is finished and non-empty. Types already on the current
+        # path (cycles) and types nested deeper than max_depth are left out,
+        # and so is any object field whose selection ends up empty, since
+        # neither a bare object field nor "{ }" is valid GraphQL.
+        tokens = []
+        stack = [(type_name, iter(fields), None, tokens)]
+        visited = {type_name}
+
+        while stack:
+            current_type, fields, _, frame_tokens = stack[-1]
+
             for field in fields:
-                if field["kind"] in ["OBJECT", "LIST"]:
-                    if field["type"] and field["type"] not in [
-                        "String",
-                        "Int",
-                        "Float",
-                        "DateTime",
-                        "JSON",
-                    ]:
-                        # Recursively generate subselection for nested objects
-                        nested_fields = Utility.generate_field_subselection(
-                            schema, field["type"]
+                nested_type = field["type"]
+
+                if (
+                    (field["kind"] == "OBJECT" or field["kind"] == "LIST")
+                    and nested_type
+                    and nested_type not in _GRAPHQL_SCALAR_NAMES
+                ):
+                    nested_fields = _extract_available_fields(schema_index, nested_type)
+
+                    # Lists of enums or custom scalars are leaves as well.
+                    if nested_fields is not None:
+                        if nested_type in visited or len(stack) >= max_depth:
+                            continue
+
+                        visited.add(nested_type)
+                        stack.append(
+                            (nested_type, iter(nested_fields), field["name"], [])
                         )
-                        subselection.append(f"{field['name']} {{ {nested_fields} }}")
-                    else:
-                        subselection.append(field["name"])
-                else:
-                    subselection.append(field["name"])
-            return " ".join(subselection)
-        except Exception:
-            return ""
+                        break
+
+                frame_tokens.append(field["name"])
+            else:
+                _, _, field_name, frame_tokens = stack.pop()
+                visited.discard(current_type)
+
+                if stack and frame_tokens:
+                    parent_tokens = stack[-1][3]
+                    parent_tokens.append(f"{field_name} {{")
+                    parent_tokens.extend(frame_tokens)
+                    parent_tokens.append("}")
+
+        subselection = " ".join(tokens)
+        schema_index["subselections"][cache_key] = subselection
+        return subselection
 
     @staticmethod
     def generate_graphql_operation(operation_name, operation_type, schema):
         def format_type(field_type):
             """Format the GraphQL type."""
-            if field_type["kind"] == "NON_NULL":
-                return f"{format_type(field_type['ofType'])}!"
-            elif field_type["kind"] == "LIST":
-                return f"[{format_type(field_type['ofType']) if field_type.get('ofType') else 'String'}]"
-            return field_type["name"]
+            # Unwrap NON_NULL/LIST iteratively, then reapply them innermost first.
+            wrappers = []
+
+            while field_type and field_type["kind"] in ("NON_NULL", "LIST"):
+                wrappers.append(field_type["kind"])
+                field_type = field_type.get("ofType")
+
+            type_string = field_type["name"] if field_type else "String"
+
+            for kind in reversed(wrappers):
+                type_string = (
+                    f"{type_string}!" if kind == "NON_NULL" else f"[{type_string}]"
+                )
+
+            return type_string
 
-        def extract_operation_details(schema, operation_name, operation_type):
+        def extract_operation_details(schema_index, operation_name, operation_type):
             """Extract operation details (query or mutation) from the schema."""
-            for type_def in schema["types"]:
-                if type_def["name"] == (
-                    "Mutations" if operation_type == "Mutation" else operation_type
-                ):
-                    for field in type_def["fields"]:
-                        if field["name"] == operation_name:
-                            return field
-            raise Exception(
-                f"{operation_type.capitalize()} '{operation_name}' not found in the schema."
-            )
+            field = _get_type_fields(
+                schema_index,
+                "Mutations" if operation_type == "Mutation" else operation_type,
+            ).get(operation_name)
+
+            if field is None:
+                raise Exception(
+                    f"{operation_type.capitalize()} '{operation_name}' not found in the schema."
+                )
+
+            return field
+
+        # Operation strings are derived from the schema alone, so they are
+        # generated once per schema and reused.
+        schema_index = _get_schema_index(schema)
+        operation_key = (operation_name, operation_type)
+        operation = schema_index["operations"].get(operation_key)
+
+        if operation is not None:
+            return operation
 
         operation_details = extract_operation_details(
-            schema, operation_name, operation_type
+            schema_index, operation_name, operation_type
         )
         args = operation_details["args"]
-        variable_definitions = ", ".join(
-            f"${arg['name']}: {format_type(arg['type'])}" for arg in args
-        )
-        argument_usage = ", ".join(f"{arg['name']}: ${arg['name']}" for arg in args)
+
+        if args:
+            variable_definitions = "({})".format(
+                ", ".join(
+                    [f"${arg['name']}: {format_type(arg['type'])}" for arg in args]
+                )
+            )
+            argument_usage = "({})".format(
+                ", ".join([f"{arg['name']}: ${arg['name']}" for arg in args])
+            )
+        else:
+            variable_definitions = argument_usage = ""
 
         return_type = operation_details["type"]
         if return_type["kind"] == "NON_NULL":
             return_type = return_type["ofType"]
         field_string = (
-            Utility.generate_field_subselection(schema, return_type["name"])
+            Utility._generate_field_subselection(schema_index, return_type["name"])
             if return_type["kind"] == "OBJECT"
             else ""
         )
 
-        if not variable_definitions and not argument_usage and not field_string:
-            return f"""{operation_type.lower()} {operation_name} {{{operation_name}}}"""
-        return f"""
-        {operation_type.lower()} {operation_name}({variable_definitions}) {{
-            {operation_name}({argument_usage}) {{
+        # Empty argument lists and selection sets are left out entirely;
+        # "()" and "{ }" are not valid GraphQL.
+        if not field_string:
+            operation = (
+                f"{operation_type.lower()} {operation_name}{variable_definitions} "
+                f"{{{operation_name}{argument_usage}}}"
+            )
+        else:
+            operation = f"""
+        {operation_type.lower()} {operation_name}{variable_definitions} {{
+            {operation_name}{argument_usage} {{
                 {field_string}
             }}
         }}
         """
+
+        schema_index["operations"][operation_key] = operation
+        return operation
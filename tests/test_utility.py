@@ -0,0 +1,123 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+from __future__ import print_function
+
+__author__ = "bibow"
+
+import dataclasses
+import enum
+import math
+import unittest
+import uuid
+from datetime import date, datetime
+from decimal import Decimal
+from unittest import mock
+
+from silvaengine_utility import utility
+from silvaengine_utility.utility import Utility
+
+
+def _object_type(name, fields):
+    return {
+        "kind": "OBJECT",
+        "name": name,
+        "fields": [
+            {
+                "name": field_name,
+                "type": {"kind": kind, "name": type_name, "ofType": None},
+                "args": [],
+            }
+            for field_name, kind, type_name in fields
+        ],
+    }
+
+
+class FieldSubselectionTest(unittest.TestCase):
+    def setUp(self):
+        self.schema = {
+            "types": [
+                _object_type("Query", [("a", "OBJECT", "A"), ("c", "OBJECT", "C")]),
+                _object_type("A", [("b", "OBJECT", "B"), ("x", "SCALAR", "String")]),
+                _object_type("B", [("a", "OBJECT", "A")]),
+                _object_type("C", [("d", "OBJECT", "D"), ("y", "SCALAR", "Int")]),
+                _object_type("D", [("e", "OBJECT", "E")]),
+                _object_type("E", [("z", "SCALAR", "String")]),
+            ]
+        }
+
+    def test_cyclic_type_with_only_object_fields_is_dropped(self):
+        # B only refers back to A, which is already on the path.
+        self.assertEqual(Utility.generate_field_subselection(self.schema, "A"), "x")
+        self.assertEqual(
+            Utility.generate_field_subselection(self.schema, "B"), "a { x }"
+        )
+
+    def test_type_at_depth_limit_with_only_object_fields_is_dropped(self):
+        self.assertEqual(
+            Utility.generate_field_subselection(self.schema, "C", max_depth=2), "y"
+        )
+        self.assertEqual(
+            Utility.generate_field_subselection(self.schema, "C", max_depth=3),
+            "d { e { z } } y",
+        )
+
+    def test_operation_has_no_empty_selection_set(self):
+        operation = Utility.generate_graphql_operation("a", "Query", self.schema)
+
+        self.assertNotIn("{ }", " ".join(operation.split()))
+        self.assertIn("x", operation)
+
+
+class _Color(enum.Enum):
+    RED = "red"
+
+
+@dataclasses.dataclass
+class _Point:
+    x: int
+    y: str
+
+
+class _Record(object):
+    def __init__(self):
+        self.amount = Decimal("1.5")
+        self.created_at = datetime(2024, 1, 2, 3, 4, 5)
+
+
+@unittest.skipIf(utility.orjson is None, "orjson is not installed")
+class JsonDumpsTest(unittest.TestCase):
+    def dumps_stdlib(self, data):
+        with mock.patch.object(utility, "orjson", None):
+            return Utility.json_dumps(data)
+
+    def test_orjson_matches_stdlib(self):
+        samples = [
+            {},
+            [],
+            {"b": [], "a": {"d": {}, "c": [{}]}},
+            {"z": 1, "a": [1, 2.5, None, True, False, "é中文\n\"\\"]},
+            {"when": datetime(2024, 1, 2, 3, 4, 5), "day": date(2024, 5, 6)},
+            {"dec": Decimal("3.25"), "int_dec": Decimal("10")},
+            {"bytes": b"xy", "bytearray": bytearray(b"z")},
+            {"record": _Record(), "point": _Point(1, "q")},
+            {"color": _Color.RED, "id": uuid.UUID(int=1)},
+            {1: "int keys", 10: "fall back"},
+            {"big": 2**70},
+            [0.1, 1.0, -0.0, 123456789.123456789],
+        ]
+
+        for data in samples:
+            with self.subTest(data=data):
+                self.assertEqual(Utility.json_dumps(data), self.dumps_stdlib(data))
+
+    def test_documented_differences(self):
+        self.assertEqual(
+            Utility.json_dumps([math.nan, math.inf]), "[\n  null,\n  null\n]"
+        )
+        self.assertEqual(self.dumps_stdlib([math.nan]), "[\n  NaN\n]")
+        self.assertEqual(Utility.json_dumps(1e16), "1e16")
+        self.assertEqual(self.dumps_stdlib(1e16), "1e+16")
+
+
+if __name__ == "__main__":
+    unittest.main()